@@ -10,15 +10,25 @@
 # Written by Nguyễn Mạnh Trường, December 2025.
 # ==============================================================================
 import sys
+import re
 import math
+import functools
 import numpy as np
-from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
-                             QHBoxLayout, QTableWidget, QTableWidgetItem, 
-                             QPushButton, QLabel, QHeaderView, QTabWidget, 
+import scipy.sparse
+import scipy.sparse.linalg
+from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
+                             QHBoxLayout, QTableWidget, QTableWidgetItem, QTableView,
+                             QPushButton, QLabel, QHeaderView, QTabWidget,
                              QMessageBox, QLineEdit, QSplitter, QComboBox, QStyledItemDelegate)
-from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtCore import Qt, QTimer, QAbstractTableModel, QModelIndex, QEvent
 from PyQt6.QtGui import QColor, QFont
 
+try:
+    import numba
+    _HAVE_NUMBA = True
+except ImportError:
+    _HAVE_NUMBA = False
+
 import matplotlib
 matplotlib.use('QtAgg')
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
@@ -26,17 +36,73 @@ from matplotlib.figure import Figure
 from matplotlib.patches import Polygon, Circle
 
 # --- Hỗ trợ đánh giá biểu thức toán học an toàn ---
+_ALLOWED_NAMES = {"sqrt": math.sqrt, "sin": math.sin, "cos": math.cos,
+                  "tan": math.tan, "pi": math.pi, "pow": math.pow, "abs": abs}
+
+# Sàng nhanh trước khi động tới parser: chỉ chấp nhận số, toán tử
+# và đúng các tên hàm cho phép -> biểu thức lạ bị loại không tốn compile()
+_SAFE_RE = re.compile(r'^(?:[0-9eE+\-*/().,\s]|sqrt|sin|cos|tan|pi|pow|abs)+$')
+
+@functools.lru_cache(maxsize=1024)
+def _compile(expr):
+    return compile(expr, "<string>", "eval")
+
 def safe_eval(expr):
     if not expr: return 0.0
+    # Đa số ô chỉ chứa số thuần ("0", "1.5") -> đường tắt float trước
+    try: return float(expr)
+    except ValueError: pass
+    if not _SAFE_RE.match(expr): return 0.0
     try:
-        allowed_names = {"sqrt": math.sqrt, "sin": math.sin, "cos": math.cos, 
-                         "tan": math.tan, "pi": math.pi, "pow": math.pow, "abs": abs}
-        code = compile(expr, "<string>", "eval")
-        for name in code.co_names:
-            if name not in allowed_names: raise NameError(f"Use of {name} is not allowed")
-        return float(eval(code, {"__builtins__": {}}, allowed_names))
+        return float(eval(_compile(expr), {"__builtins__": {}}, _ALLOWED_NAMES))
     except Exception: return 0.0
 
+def _to_float(txt):
+    # Ô chỉ chứa số thuần đi thẳng qua float; biểu thức mới cần safe_eval
+    try: return float(txt)
+    except ValueError: return safe_eval(txt)
+
+# Cột của node_arr trong get_input_data: x, y, fx, fy, góc gối, mã gối
+_COL_X, _COL_Y, _COL_FX, _COL_FY, _COL_SANG, _COL_SUPP = range(6)
+_SUPPORT_CODES = {"-": 0, "Gối Cố Định": 1, "Gối Di Động": 2}
+_SUPP_NONE, _SUPP_FIXED, _SUPP_ROLLER = 0, 1, 2
+
+# --- Lắp ghép bộ ba COO cho các thanh ---
+# Với giàn sinh tự động hàng nghìn thanh, vòng lặp numba biên dịch sẵn
+# nhanh hơn; không có numba thì dùng bản NumPy vector hóa tương đương.
+def _assemble_bars_py(coords, u_idx, v_idx, rows, cols, data, lengths):
+    n_bars = u_idx.shape[0]
+    d = coords[v_idx] - coords[u_idx]
+    L = np.hypot(d[:, 0], d[:, 1])
+    lengths[:] = L
+    safe_L = np.where(L < 1e-6, 1.0, L)
+    c = d[:, 0] / safe_L
+    s = d[:, 1] / safe_L
+    rows[0::4] = 2*u_idx; rows[1::4] = 2*u_idx+1
+    rows[2::4] = 2*v_idx; rows[3::4] = 2*v_idx+1
+    cols[0::4] = cols[1::4] = cols[2::4] = cols[3::4] = np.arange(n_bars)
+    data[0::4] = c; data[1::4] = s
+    data[2::4] = -c; data[3::4] = -s
+
+if _HAVE_NUMBA:
+    @numba.njit(cache=True, fastmath=True)
+    def _assemble_bars(coords, u_idx, v_idx, rows, cols, data, lengths):
+        for j in range(u_idx.shape[0]):
+            u = u_idx[j]; v = v_idx[j]
+            dx = coords[v, 0] - coords[u, 0]
+            dy = coords[v, 1] - coords[u, 1]
+            L = math.sqrt(dx*dx + dy*dy)
+            lengths[j] = L
+            invL = 1.0 / L if L >= 1e-6 else 1.0
+            c = dx * invL
+            s = dy * invL
+            k = 4*j
+            rows[k] = 2*u; rows[k+1] = 2*u+1; rows[k+2] = 2*v; rows[k+3] = 2*v+1
+            cols[k] = j;   cols[k+1] = j;     cols[k+2] = j;   cols[k+3] = j
+            data[k] = c;   data[k+1] = s;     data[k+2] = -c;  data[k+3] = -s
+else:
+    _assemble_bars = _assemble_bars_py
+
 # --- Delegate để tự động viết hoa và chỉnh màu chữ khi nhập ---
 class UpperCaseDelegate(QStyledItemDelegate):
     def createEditor(self, parent, option, index):
@@ -56,12 +122,101 @@ class UpperCaseDelegate(QStyledItemDelegate):
             model.setData(index, editor.text().upper(), Qt.ItemDataRole.EditRole)
         else: super().setModelData(editor, model, index)
 
+# --- Model bảng nhập liệu ---
+class ArrayTableModel(QAbstractTableModel):
+    """Bảng nhập liệu lưu thẳng các hàng chuỗi: data() trả giá trị không
+    phải cấp phát QTableWidgetItem (Python + C++) cho từng ô như trước."""
+
+    _BLACK = QColor("black")
+
+    def __init__(self, headers, tooltips=None, parent=None):
+        super().__init__(parent)
+        self._headers = headers
+        self._tooltips = tooltips or {}
+        self._rows = []
+
+    def rows(self):
+        return self._rows
+
+    def reset_rows(self, rows):
+        self.beginResetModel()
+        self._rows = rows
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self._headers)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid(): return None
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return self._rows[index.row()][index.column()]
+        if role == Qt.ItemDataRole.ForegroundRole:
+            return self._BLACK
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return self._tooltips.get(index.column())
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if role != Qt.ItemDataRole.EditRole or not index.isValid(): return False
+        self._rows[index.row()][index.column()] = str(value)
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole])
+        return True
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self._headers[section]
+        return super().headerData(section, orientation, role)
+
+    def flags(self, index):
+        return (Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsEnabled |
+                Qt.ItemFlag.ItemIsEditable)
+
+# --- Delegate chọn loại gối bằng combobox ---
+class SupportDelegate(QStyledItemDelegate):
+    OPTIONS = ("-", "Gối Cố Định", "Gối Di Động")
+
+    def createEditor(self, parent, option, index):
+        cb = QComboBox(parent)
+        cb.addItems(self.OPTIONS)
+        return cb
+
+    def setEditorData(self, editor, index):
+        i = editor.findText(index.model().data(index, Qt.ItemDataRole.EditRole) or "-")
+        if i >= 0: editor.setCurrentIndex(i)
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentText(), Qt.ItemDataRole.EditRole)
+
 class MplCanvas(FigureCanvas):
     def __init__(self, parent=None, width=6, height=5, dpi=100):
         self.fig = Figure(figsize=(width, height), dpi=dpi)
         self.axes = self.fig.add_subplot(111)
         super(MplCanvas, self).__init__(self.fig)
         self.axes.set_aspect('equal')
+        # Blitting: sau mỗi lần vẽ đầy đủ, cache phần nền tĩnh (trục, lưới,
+        # tiêu đề); các artist động (animated=True) được vẽ đè lên nền đó
+        self._bg = None
+        self.animated_artists = []
+        self.mpl_connect('draw_event', self._on_draw)
+
+    def _on_draw(self, event):
+        self._bg = self.copy_from_bbox(self.axes.bbox)
+        for a in self.animated_artists:
+            self.axes.draw_artist(a)
+
+    def blit_animated(self):
+        """Vẽ nhanh: phục hồi nền đã cache rồi chỉ vẽ lại artist động."""
+        if self._bg is None:
+            self.draw_idle()
+            return
+        self.restore_region(self._bg)
+        for a in self.animated_artists:
+            self.axes.draw_artist(a)
+        self.blit(self.axes.bbox)
+        self.flush_events()
 
 class TrussApp(QMainWindow):
     def __init__(self):
@@ -77,14 +232,14 @@ class TrussApp(QMainWindow):
                 color: black; 
                 padding: 6px; border: 1px solid #bdc3c7; border-radius: 4px; 
             }
-            QTableWidget { 
-                background-color: white; 
-                color: black; 
-                gridline-color: #ecf0f1; 
-                font-size: 10pt; 
-                border: 1px solid #bdc3c7; 
+            QTableWidget, QTableView {
+                background-color: white;
+                color: black;
+                gridline-color: #ecf0f1;
+                font-size: 10pt;
+                border: 1px solid #bdc3c7;
             }
-            QTableWidget QLineEdit { color: black; background-color: white; }
+            QTableWidget QLineEdit, QTableView QLineEdit { color: black; background-color: white; }
             QHeaderView::section { background-color: #ecf0f1; color: #2c3e50; padding: 6px; font-weight: bold; border: 1px solid #bdc3c7; }
             QPushButton { background-color: #3498db; color: white; padding: 8px; font-weight: bold; border-radius: 4px; text-transform: uppercase; }
             QPushButton:hover { background-color: #2980b9; }
@@ -99,6 +254,28 @@ class TrussApp(QMainWindow):
         self.timer.setSingleShot(True)
         self.timer.timeout.connect(self.plot_preview)
 
+        # Cache phân rã LU: khi hình học/gối không đổi (chỉ đổi tải trọng)
+        # thì tái sử dụng phân rã cũ thay vì phân rã lại từ đầu
+        self._lu_cache = None
+        self._geom_hash = None
+        # Thứ tự hoán vị cột khi phân rã LU; COLAMD giảm fill-in rõ rệt so
+        # với thứ tự tự nhiên, có thể đổi sang 'MMD_AT_PLUS_A' để thử nghiệm
+        self._permc = 'COLAMD'
+
+        # Artist matplotlib được tạo một lần theo cấu trúc (topology);
+        # khi chỉ tọa độ/lực thay đổi thì cập nhật dữ liệu artist cũ
+        # thay vì clear() rồi cấp phát lại toàn bộ
+        self._plot_topo = None
+        self._last_input_hash = None
+        self._debug_data = None
+        self._debug_dirty = False
+        self._pending_plot = None
+        self._bar_lines = []
+        self._bar_texts = []
+        self._node_markers = []
+        self._node_labels = []
+        self._overlay_artists = []
+
         main_widget = QWidget()
         self.setCentralWidget(main_widget)
         layout = QHBoxLayout(main_widget)
@@ -123,23 +300,28 @@ class TrussApp(QMainWindow):
         left_vbox.addWidget(cfg_frame)
 
         self.tabs = QTabWidget()
-        
-        self.tb_nodes = QTableWidget()
-        self.tb_nodes.setColumnCount(7) 
-        self.tb_nodes.setHorizontalHeaderLabels(["ID Nút (Tên)", "X (m)", "Y (m)", "Fx (kN)", "Fy (kN)", "Gối Đỡ", "Góc Gối (độ)"])
+
+        self.node_model = ArrayTableModel(
+            ["ID Nút (Tên)", "X (m)", "Y (m)", "Fx (kN)", "Fy (kN)", "Gối Đỡ", "Góc Gối (độ)"],
+            tooltips={6: "Góc của mặt phẳng lăn (0=Ngang -> Phản lực đứng)"}, parent=self)
+        self.node_model.dataChanged.connect(self.schedule_update)
+        self.tb_nodes = QTableView()
+        self.tb_nodes.setModel(self.node_model)
         self.tb_nodes.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.tb_nodes.setItemDelegateForColumn(5, SupportDelegate(self.tb_nodes))
         self.tabs.addTab(self.tb_nodes, "1. THÔNG SỐ NÚT")
 
-        self.tb_bars = QTableWidget()
-        self.tb_bars.setColumnCount(3)
-        self.tb_bars.setHorizontalHeaderLabels(["ID Thanh", "Nút Đầu", "Nút Cuối"])
+        self.bar_model = ArrayTableModel(["ID Thanh", "Nút Đầu", "Nút Cuối"], parent=self)
+        self.bar_model.dataChanged.connect(self.schedule_update)
+        self.tb_bars = QTableView()
+        self.tb_bars.setModel(self.bar_model)
         self.tb_bars.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.tabs.addTab(self.tb_bars, "2. LIÊN KẾT THANH")
-        
+
         upper_delegate = UpperCaseDelegate(self.tb_bars)
         self.tb_bars.setItemDelegateForColumn(1, upper_delegate)
         self.tb_bars.setItemDelegateForColumn(2, upper_delegate)
-        
+
         left_vbox.addWidget(self.tabs)
 
         action_layout = QHBoxLayout()
@@ -169,12 +351,14 @@ class TrussApp(QMainWindow):
         self.tb_check.setHorizontalHeaderLabels(["Thanh/Gối", "Nút", "Góc (độ)", "Hệ Số (Cos/Sin)"])
         self.tb_check.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.res_tabs.addTab(self.tb_check, "Ma Trận A")
+        self.res_tabs.currentChanged.connect(self._refresh_check_matrix)
         left_vbox.addWidget(self.res_tabs)
 
         right_panel = QWidget()
         right_vbox = QVBoxLayout(right_panel)
         right_vbox.addStretch(1)
         self.canvas = MplCanvas(self)
+        self.canvas.installEventFilter(self)
         canvas_container = QWidget()
         canvas_layout = QVBoxLayout(canvas_container)
         canvas_layout.addWidget(QLabel("MÔ HÌNH HÌNH HỌC (Dựa trên Tọa độ X, Y)"))
@@ -190,282 +374,373 @@ class TrussApp(QMainWindow):
         self.reset_tables()
 
     def reset_tables(self):
+        self._lu_cache = None
+        self._geom_hash = None
+        _compile.cache_clear()
         try:
             txt_nodes = self.inp_nodes.text().strip() or "5"
             txt_bars = self.inp_bars.text().strip() or "7"
             n_nodes, n_bars = int(txt_nodes), int(txt_bars)
-            
-            self.tb_nodes.setRowCount(n_nodes)
-            for i in range(n_nodes):
-                node_name = chr(65 + i) if i < 26 else f"N{i+1}"
-                item_name = QTableWidgetItem(node_name)
-                item_name.setForeground(QColor("black"))
-                self.tb_nodes.setItem(i, 0, item_name)
-                
-                for j in range(1, 5): 
-                    item = QTableWidgetItem("0")
-                    item.setForeground(QColor("black"))
-                    self.tb_nodes.setItem(i, j, item)
-                
-                cb = QComboBox()
-                cb.addItems(["-", "Gối Cố Định", "Gối Di Động"])
-                cb.currentTextChanged.connect(self.schedule_update)
-                self.tb_nodes.setCellWidget(i, 5, cb)
-                
-                item_angle = QTableWidgetItem("0")
-                item_angle.setToolTip("Góc của mặt phẳng lăn (0=Ngang -> Phản lực đứng)")
-                item_angle.setForeground(QColor("black"))
-                self.tb_nodes.setItem(i, 6, item_angle)
-
-            self.tb_bars.setRowCount(n_bars)
-            for i in range(n_bars):
-                item_id = QTableWidgetItem(str(i+1))
-                item_id.setForeground(QColor("black"))
-                self.tb_bars.setItem(i, 0, item_id)
-                
-                item_u = QTableWidgetItem("")
-                item_u.setForeground(QColor("black"))
-                self.tb_bars.setItem(i, 1, item_u)
-                
-                item_v = QTableWidgetItem("")
-                item_v.setForeground(QColor("black"))
-                self.tb_bars.setItem(i, 2, item_v)
-
-            try:
-                self.tb_nodes.itemChanged.disconnect()
-                self.tb_bars.itemChanged.disconnect()
-            except: pass
-            self.tb_nodes.itemChanged.connect(self.schedule_update)
-            self.tb_bars.itemChanged.connect(self.schedule_update)
-            self.plot_preview()
         except ValueError:
             QMessageBox.warning(self, "Lỗi", "Số lượng phải là số nguyên!")
+            return
+
+        # Một lần reset model thay cho O(N) lần setItem; view vẽ lại đúng
+        # một lần và không có dataChanged nào bắn ra giữa chừng
+        node_rows = []
+        for i in range(n_nodes):
+            node_name = chr(65 + i) if i < 26 else f"N{i+1}"
+            node_rows.append([node_name, "0", "0", "0", "0", "-", "0"])
+        self.node_model.reset_rows(node_rows)
+
+        self.bar_model.reset_rows([[str(i+1), "", ""] for i in range(n_bars)])
+        self.plot_preview()
 
     def schedule_update(self):
         self.timer.start()
 
     def get_input_data(self):
-        nodes = {}
-        bars = []
+        # Bố cục SoA: một mảng (n, 6) theo nút (x, y, fx, fy, góc gối, mã
+        # gối) thay vì dict lồng dict, để lắp ghép/vẽ dùng thẳng chỉ số NumPy
+        node_keys = []
+        node_rows = []
+        map_idx = {}
+        bar_ids = []
+        bar_uv = []
         try:
-            for r in range(self.tb_nodes.rowCount()):
-                nid_item = self.tb_nodes.item(r, 0)
-                if not nid_item: continue
-                nid = nid_item.text().strip()
+            for cells in self.node_model.rows():
+                nid = cells[0].strip()
                 if not nid: continue
-                
-                x_val = safe_eval(self.tb_nodes.item(r, 1).text())
-                y_val = safe_eval(self.tb_nodes.item(r, 2).text())
-                fx_val = safe_eval(self.tb_nodes.item(r, 3).text())
-                fy_val = safe_eval(self.tb_nodes.item(r, 4).text())
-                angle_supp_val = safe_eval(self.tb_nodes.item(r, 6).text())
-                
-                cb = self.tb_nodes.cellWidget(r, 5)
-                supp = cb.currentText() if cb else "-"
-                
-                nodes[nid] = {'x': x_val, 'y': y_val, 'fx': fx_val, 'fy': fy_val, 's': supp, 's_angle': angle_supp_val}
-
-            for r in range(self.tb_bars.rowCount()):
-                bid = self.tb_bars.item(r, 0).text()
-                u_item = self.tb_bars.item(r, 1)
-                v_item = self.tb_bars.item(r, 2)
-                
-                if not (u_item and v_item): continue
-                u_name = u_item.text().strip().upper()
-                v_name = v_item.text().strip().upper()
-                
+
+                row = (_to_float(cells[1]), _to_float(cells[2]),
+                       _to_float(cells[3]), _to_float(cells[4]),
+                       _to_float(cells[6]),
+                       _SUPPORT_CODES.get(cells[5], _SUPP_NONE))
+
+                if nid in map_idx:
+                    node_rows[map_idx[nid]] = row
+                else:
+                    map_idx[nid] = len(node_keys)
+                    node_keys.append(nid)
+                    node_rows.append(row)
+
+            for cells in self.bar_model.rows():
+                bid = cells[0]
+                u_name = cells[1].strip().upper()
+                v_name = cells[2].strip().upper()
                 if not (u_name and v_name): continue
-                if u_name not in nodes: nodes[u_name] = {'x':0,'y':0, 'fx':0,'fy':0,'s':'-', 's_angle': 0}
-                if v_name not in nodes: nodes[v_name] = {'x':0,'y':0, 'fx':0,'fy':0,'s':'-', 's_angle': 0}
 
-                bars.append({'id': bid, 'u': u_name, 'v': v_name})
-        except: return None, None
-        if not nodes: return None, None
-        return nodes, bars
+                for name in (u_name, v_name):
+                    if name not in map_idx:
+                        map_idx[name] = len(node_keys)
+                        node_keys.append(name)
+                        node_rows.append((0.0, 0.0, 0.0, 0.0, 0.0, _SUPP_NONE))
+
+                bar_ids.append(bid)
+                bar_uv.append((map_idx[u_name], map_idx[v_name]))
+        except: return None
+        if not node_keys: return None
+        return (node_keys,
+                np.asarray(node_rows, dtype=np.float64).reshape(-1, 6),
+                bar_ids, np.asarray(bar_uv, dtype=np.intp).reshape(-1, 2))
 
     def plot_preview(self):
+        # Hash chuỗi thô của toàn bộ ô nhập rẻ hơn nhiều so với parse lại
+        # từng ô; không có gì đổi (vd chỉ Tab qua lại) thì khỏi vẽ lại
+        input_hash = hash((tuple(map(tuple, self.node_model.rows())),
+                           tuple(map(tuple, self.bar_model.rows()))))
+        if input_hash == self._last_input_hash:
+            return
+        self._last_input_hash = input_hash
         self.plot_structure(None, None)
 
-    def plot_structure(self, S_forces, R_forces):
-        nodes, bars = self.get_input_data()
-        self.canvas.axes.clear()
-        self.canvas.axes.grid(True, linestyle=':', alpha=0.6)
-        self.canvas.axes.set_title("Sơ Đồ Kết Cấu & Biểu Đồ Lực")
+    def eventFilter(self, obj, event):
+        # Canvas vừa hiện trở lại: vẽ bù một lần nếu có lần vẽ bị bỏ qua lúc ẩn
+        if obj is self.canvas and event.type() == QEvent.Type.Show and self._pending_plot is not None:
+            pending, self._pending_plot = self._pending_plot, None
+            QTimer.singleShot(0, lambda: self.plot_structure(*pending))
+        return super().eventFilter(obj, event)
 
-        if not nodes:
-            self.canvas.draw()
+    def plot_structure(self, S_forces, R_forces):
+        # Canvas đang ẩn (cửa sổ thu nhỏ, panel đóng): vẽ cũng không ra
+        # pixel nào, ghi nhớ tham số để vẽ bù khi canvas hiện lại
+        if not self.canvas.isVisible():
+            self._pending_plot = (S_forces, R_forces)
             return
 
-        xs = [n['x'] for n in nodes.values()]
-        ys = [n['y'] for n in nodes.values()]
-        if xs and ys:
-            margin = max(1.5, (max(xs)-min(xs))*0.1)
-            self.canvas.axes.set_xlim(min(xs)-margin, max(xs)+margin)
-            self.canvas.axes.set_ylim(min(ys)-margin, max(ys)+margin)
+        data = self.get_input_data()
+        ax = self.canvas.axes
+
+        if data is None:
+            ax.clear()
+            ax.grid(True, linestyle=':', alpha=0.6)
+            ax.set_title("Sơ Đồ Kết Cấu & Biểu Đồ Lực")
+            self._plot_topo = None
+            self.canvas.animated_artists = []
+            self.canvas.draw_idle()
+            return
+        node_keys, node_arr, bar_ids, bar_uv = data
+        xs = node_arr[:, _COL_X]
+        ys = node_arr[:, _COL_Y]
+
+        # Cấu trúc không đổi -> giữ nguyên artist, chỉ cập nhật dữ liệu
+        topo = (tuple(node_keys), bar_uv.tobytes())
+        rebuild = topo != self._plot_topo
+
+        if rebuild:
+            ax.clear()
+            ax.grid(True, linestyle=':', alpha=0.6)
+            ax.set_title("Sơ Đồ Kết Cấu & Biểu Đồ Lực")
+            self._bar_lines = []
+            self._bar_texts = []
+            self._node_markers = []
+            self._node_labels = []
+            self._overlay_artists = []
+        else:
+            # Gối và mũi tên lực thì ít, loại gối/lực có thể đổi mà không
+            # đổi topology -> luôn vẽ lại nhóm này
+            for a in self._overlay_artists:
+                a.remove()
+            self._overlay_artists = []
+
+        old_lims = (ax.get_xlim(), ax.get_ylim())
+        if len(xs):
+            margin = max(1.5, (xs.max()-xs.min())*0.1)
+            ax.set_xlim(xs.min()-margin, xs.max()+margin)
+            ax.set_ylim(ys.min()-margin, ys.max()+margin)
+        # Giới hạn trục đổi thì nền đã cache không còn dùng được cho blit
+        lims_changed = (ax.get_xlim(), ax.get_ylim()) != old_lims
+
+        max_force = float(np.abs(S_forces).max()) if S_forces is not None and S_forces.size else 1.0
+        max_force = max_force or 1.0
+        inv_maxf = 1.0 / max_force
 
-        max_force = 1.0
         if S_forces is not None:
-            vals = np.abs(S_forces)
-            if len(vals) > 0: max_force = np.max(vals)
-            if max_force == 0: max_force = 1.0
-
-        for i, b in enumerate(bars):
-            if b['u'] in nodes and b['v'] in nodes:
-                p1 = nodes[b['u']]
-                p2 = nodes[b['v']]
-                color = 'black'
-                width = 2
-                label_txt = f"[{b['id']}]"
-                
-                if S_forces is not None and i < len(S_forces):
-                    val = S_forces[i]
-                    if val > 1e-4: 
-                        color = '#2980b9' 
-                        label_txt = f"{val:.2f}"
-                    elif val < -1e-4: 
-                        color = '#c0392b' 
-                        label_txt = f"{val:.2f}"
-                    else:
-                        color = '#95a5a6'
-                        label_txt = "0"
-                    width = 1 + (abs(val)/max_force)*4 
-
-                self.canvas.axes.plot([p1['x'], p2['x']], [p1['y'], p2['y']], 
-                                      color=color, linewidth=width, marker='o', markersize=4, zorder=1)
-                mx, my = (p1['x']+p2['x'])/2, (p1['y']+p2['y'])/2
-                self.canvas.axes.text(mx, my, label_txt, color=color, fontsize=9, fontweight='bold',
-                                      bbox=dict(facecolor='white', edgecolor='none', alpha=0.7, pad=1))
-
-        for nid, n in nodes.items():
-            x, y = n['x'], n['y']
-            s_angle = n['s_angle'] 
-            
-            self.canvas.axes.plot(x, y, 'ko', markersize=6, zorder=5)
-            self.canvas.axes.text(x, y+0.25, str(nid), fontweight='bold', fontsize=10, ha='center',
-                                  bbox=dict(facecolor='white', edgecolor='none', alpha=0.6, pad=0.5), zorder=6)
-            
-            if n['s'] != "-":
-                tr = matplotlib.transforms.Affine2D().rotate_deg_around(x, y, s_angle) + self.canvas.axes.transData
-                
-                if n['s'] == "Gối Cố Định":
-                    p = Polygon([(x, y), (x-0.2, y-0.35), (x+0.2, y-0.35)], closed=True, 
+            # Phân loại kéo/nén/~0 một lần cho cả mảng: 0 = nén, 1 = ~0, 2 = kéo,
+            # trong vòng lặp chỉ còn tra bảng thay vì rẽ nhánh ba chiều
+            signs = np.sign(np.where(np.abs(S_forces) > 1e-4, S_forces, 0)).astype(int) + 1
+            widths = 1 + np.abs(S_forces)*inv_maxf*4
+        palette = ('#c0392b', '#95a5a6', '#2980b9')
+
+        for i in range(len(bar_ids)):
+            u, v = bar_uv[i]
+            p1x, p1y = xs[u], ys[u]
+            p2x, p2y = xs[v], ys[v]
+            color = 'black'
+            width = 2
+            label_txt = f"[{bar_ids[i]}]"
+
+            if S_forces is not None and i < len(S_forces):
+                k = signs[i]
+                color = palette[k]
+                label_txt = f"{S_forces[i]:.2f}" if k != 1 else "0"
+                width = widths[i]
+
+            mx, my = (p1x+p2x)/2, (p1y+p2y)/2
+            if rebuild:
+                line, = ax.plot([p1x, p2x], [p1y, p2y], animated=True,
+                                color=color, linewidth=width, marker='o', markersize=4, zorder=1)
+                self._bar_lines.append(line)
+                txt = ax.text(mx, my, label_txt, color=color, fontsize=9, fontweight='bold', animated=True,
+                              bbox=dict(facecolor='white', edgecolor='none', alpha=0.7, pad=1))
+                self._bar_texts.append(txt)
+            else:
+                line = self._bar_lines[i]
+                line.set_data([p1x, p2x], [p1y, p2y])
+                line.set_color(color)
+                line.set_linewidth(width)
+                txt = self._bar_texts[i]
+                txt.set_position((mx, my))
+                txt.set_text(label_txt)
+                txt.set_color(color)
+
+        for i, nid in enumerate(node_keys):
+            x, y = xs[i], ys[i]
+            s_code = int(node_arr[i, _COL_SUPP])
+            s_angle = node_arr[i, _COL_SANG]
+
+            if rebuild:
+                marker, = ax.plot(x, y, 'ko', markersize=6, zorder=5, animated=True)
+                self._node_markers.append(marker)
+                lbl = ax.text(x, y+0.25, str(nid), fontweight='bold', fontsize=10, ha='center', animated=True,
+                              bbox=dict(facecolor='white', edgecolor='none', alpha=0.6, pad=0.5), zorder=6)
+                self._node_labels.append(lbl)
+            else:
+                self._node_markers[i].set_data([x], [y])
+                self._node_labels[i].set_position((x, y+0.25))
+
+            if s_code != _SUPP_NONE:
+                tr = matplotlib.transforms.Affine2D().rotate_deg_around(x, y, s_angle) + ax.transData
+
+                if s_code == _SUPP_FIXED:
+                    p = Polygon([(x, y), (x-0.2, y-0.35), (x+0.2, y-0.35)], closed=True, animated=True,
                                 facecolor='white', edgecolor='black', transform=tr, zorder=4)
-                    self.canvas.axes.add_patch(p)
-                    line_ground = matplotlib.lines.Line2D([x-0.3, x+0.3], [y-0.35, y-0.35], color='black', transform=tr)
-                    self.canvas.axes.add_line(line_ground)
-                    
-                elif n['s'] == "Gối Di Động":
-                    c = Circle((x, y-0.15), 0.15, facecolor='white', edgecolor='black', transform=tr, zorder=4)
-                    self.canvas.axes.add_patch(c)
-                    line_ground = matplotlib.lines.Line2D([x-0.3, x+0.3], [y-0.3, y-0.3], color='black', transform=tr)
-                    self.canvas.axes.add_line(line_ground)
-
-            if abs(n['fx']) > 0 or abs(n['fy']) > 0:
+                    ax.add_patch(p)
+                    line_ground = matplotlib.lines.Line2D([x-0.3, x+0.3], [y-0.35, y-0.35], color='black',
+                                                          transform=tr, animated=True)
+                    ax.add_line(line_ground)
+                    self._overlay_artists.extend((p, line_ground))
+
+                elif s_code == _SUPP_ROLLER:
+                    c = Circle((x, y-0.15), 0.15, facecolor='white', edgecolor='black', animated=True,
+                               transform=tr, zorder=4)
+                    ax.add_patch(c)
+                    line_ground = matplotlib.lines.Line2D([x-0.3, x+0.3], [y-0.3, y-0.3], color='black',
+                                                          transform=tr, animated=True)
+                    ax.add_line(line_ground)
+                    self._overlay_artists.extend((c, line_ground))
+
+            fx, fy = node_arr[i, _COL_FX], node_arr[i, _COL_FY]
+            if abs(fx) > 0 or abs(fy) > 0:
                 scale = 0.5
-                mag = math.sqrt(n['fx']**2 + n['fy']**2)
+                mag = math.sqrt(fx**2 + fy**2)
                 if mag > 0:
-                    dx = (n['fx'] / mag) * scale
-                    dy = (n['fy'] / mag) * scale
-                    self.canvas.axes.arrow(x, y, dx, dy, head_width=0.15, head_length=0.2, 
-                                           fc='#27ae60', ec='#27ae60', zorder=6)
-                    self.canvas.axes.text(x+dx*1.2, y+dy*1.2, "F", color='#27ae60', fontsize=9, fontweight='bold')
-
-        self.canvas.draw()
+                    dx = (fx / mag) * scale
+                    dy = (fy / mag) * scale
+                    arrow = ax.arrow(x, y, dx, dy, head_width=0.15, head_length=0.2,
+                                     fc='#27ae60', ec='#27ae60', zorder=6, animated=True)
+                    f_lbl = ax.text(x+dx*1.2, y+dy*1.2, "F", color='#27ae60', fontsize=9,
+                                    fontweight='bold', animated=True)
+                    self._overlay_artists.extend((arrow, f_lbl))
+
+        self._plot_topo = topo
+        self.canvas.animated_artists = (self._bar_lines + self._bar_texts +
+                                        self._node_markers + self._node_labels +
+                                        self._overlay_artists)
+        if rebuild or lims_changed:
+            self.canvas.draw_idle()
+        else:
+            self.canvas.blit_animated()
 
     def calculate(self):
-        nodes, bars = self.get_input_data()
-        if not nodes or not bars: return
-
-        n_nodes = len(nodes)
-        n_bars = len(bars)
-        
-        reaction_map = [] 
-        node_keys = sorted(nodes.keys())
-        map_idx = {nid: i for i, nid in enumerate(node_keys)} 
-
-        for nid in node_keys:
-            s_type = nodes[nid]['s']
-            s_angle = nodes[nid]['s_angle']
-            idx = map_idx[nid]
-            
-            if s_type == "Gối Cố Định":
-                reaction_map.append((idx, 'x', f"Ax_{nid}", 0)) 
+        data = self.get_input_data()
+        if data is None: return
+        node_keys, node_arr, bar_ids, bar_uv = data
+        if not bar_ids: return
+
+        n_nodes = len(node_keys)
+        n_bars = len(bar_ids)
+        s_codes = node_arr[:, _COL_SUPP]
+        s_angles = node_arr[:, _COL_SANG]
+
+        reaction_map = []
+        for idx, nid in enumerate(node_keys):
+            s_code = s_codes[idx]
+
+            if s_code == _SUPP_FIXED:
+                reaction_map.append((idx, 'x', f"Ax_{nid}", 0))
                 reaction_map.append((idx, 'y', f"Ay_{nid}", 90))
-                
-            elif s_type == "Gối Di Động":
-                reaction_angle = s_angle + 90
+
+            elif s_code == _SUPP_ROLLER:
+                reaction_angle = s_angles[idx] + 90
                 reaction_map.append((idx, 'custom', f"R_{nid}", reaction_angle))
 
         n_reactions = len(reaction_map)
-        n_unknowns = n_bars + n_reactions 
-        n_equations = 2 * n_nodes         
-        
-        A = np.zeros((n_equations, n_unknowns))
-        F_vec = np.zeros(n_equations)
-        debug_info = [] 
+        n_unknowns = n_bars + n_reactions
+        n_equations = 2 * n_nodes
 
-        for nid, n in nodes.items():
-            idx = map_idx[nid]
-            F_vec[2*idx]   = -n['fx'] 
-            F_vec[2*idx+1] = -n['fy'] 
+        # Ma trận A rất thưa: mỗi thanh chỉ đóng góp 4 phần tử, mỗi gối 2 phần tử.
+        # Lắp ghép dạng COO (rows, cols, data) rồi chuyển sang CSC để giải.
+        F_vec = np.zeros(n_equations)
+        F_vec[0::2] = -node_arr[:, _COL_FX]
+        F_vec[1::2] = -node_arr[:, _COL_FY]
+
+        # Lắp ghép toàn bộ thanh (numba nếu có, NumPy vector hóa nếu không)
+        coords = np.ascontiguousarray(node_arr[:, _COL_X:_COL_Y+1])
+        u_idx = bar_uv[:, 0]
+        v_idx = bar_uv[:, 1]
+
+        rows = np.empty(4*n_bars, dtype=np.intp)
+        cols = np.empty(4*n_bars, dtype=np.intp)
+        data = np.empty(4*n_bars, dtype=np.float64)
+        L = np.empty(n_bars, dtype=np.float64)
+        _assemble_bars(coords, u_idx, v_idx, rows, cols, data, L)
+
+        if np.any(L < 1e-6):
+            bad = bar_ids[int(np.argmin(L))]
+            QMessageBox.critical(self, "Lỗi", f"Thanh {bad} có chiều dài ~ 0!")
+            return
 
-        for j, b in enumerate(bars):
-            u, v = b['u'], b['v']
-            p1, p2 = nodes[u], nodes[v]
-            
-            dx = p2['x'] - p1['x']
-            dy = p2['y'] - p1['y']
-            L = math.sqrt(dx**2 + dy**2)
-            
-            if L < 1e-6:
-                QMessageBox.critical(self, "Lỗi", f"Thanh {b['id']} có chiều dài ~ 0!")
-                return
+        c_arr = data[0::4]
+        s_arr = data[1::4]
+        cs = ss = np.empty(0)
+
+        if n_reactions:
+            # Các hàng phản lực gối cũng đi theo lô: đổi góc -> (cos, sin)
+            # cho toàn bộ gối trong một lần gọi
+            r_node_idx = np.array([rm[0] for rm in reaction_map], dtype=np.intp)
+            rad_r = np.deg2rad(np.array([rm[3] for rm in reaction_map], dtype=np.float64))
+            cs = np.cos(rad_r)
+            ss = np.sin(rad_r)
+            r_cols = n_bars + np.arange(n_reactions)
+
+            rows = np.concatenate((rows, 2*r_node_idx, 2*r_node_idx+1))
+            cols = np.concatenate((cols, r_cols, r_cols))
+            data = np.concatenate((data, cs, ss))
+
+        # Kiểm tra cấu trúc rẻ trước khi giải: một hàng toàn 0 trong A nghĩa
+        # là phương trình cân bằng của nút đó không dính tới ẩn nào (nút
+        # không có thanh lẫn gối theo phương tương ứng) -> giải chỉ ra NaN
+        row_nnz = np.bincount(rows, minlength=n_equations)
+        if row_nnz.min() == 0:
+            zero_rows = np.where(row_nnz == 0)[0]
+            dofs = ", ".join(f"{node_keys[i//2]} (phương {'X' if i % 2 == 0 else 'Y'})"
+                             for i in zero_rows)
+            QMessageBox.critical(self, "Lỗi",
+                                 f"Nút không có thanh/gối liên kết: {dofs}!")
+            return
 
-            c = dx / L
-            s = dy / L
-            angle_deg = math.degrees(math.atan2(dy, dx))
-            
-            idx_u = map_idx[u]
-            idx_v = map_idx[v]
+        if n_equations > n_unknowns:
+            QMessageBox.warning(self, "Cảnh Báo",
+                                "Số phương trình nhiều hơn số ẩn (hệ kém định) — "
+                                "kết quả là nghiệm bình phương tối thiểu.")
 
-            A[2*idx_u, j]   = c
-            A[2*idx_u+1, j] = s
-            debug_info.append((f"Thanh {b['id']}", u, f"{angle_deg:.1f}", f"C:{c:.2f} S:{s:.2f}"))
+        # Hash hình học: tọa độ nút, liên kết thanh và gối quyết định A,
+        # còn F_vec thì không — trùng hash nghĩa là dùng lại được phân rã cũ
+        geom_hash = hash((tuple(node_keys), coords.tobytes(), bar_uv.tobytes(),
+                          s_codes.tobytes(), s_angles.tobytes()))
 
-            A[2*idx_v, j]   = -c
-            A[2*idx_v+1, j] = -s
-            ang_v = angle_deg + 180
-            if ang_v > 180: ang_v -= 360
-            debug_info.append((f"Thanh {b['id']}", v, f"{ang_v:.1f}", f"C:{-c:.2f} S:{-s:.2f}"))
+        try:
+            if n_equations == n_unknowns:
+                if geom_hash == self._geom_hash and self._lu_cache is not None:
+                    X = self._lu_cache.solve(F_vec)
+                else:
+                    A_csc = scipy.sparse.coo_matrix((data, (rows, cols)),
+                                                    shape=(n_equations, n_unknowns)).tocsc()
+                    self._lu_cache = scipy.sparse.linalg.splu(A_csc, permc_spec=self._permc)
+                    self._geom_hash = geom_hash
+                    X = self._lu_cache.solve(F_vec)
+            else:
+                A_csc = scipy.sparse.coo_matrix((data, (rows, cols)),
+                                                shape=(n_equations, n_unknowns)).tocsc()
+                X = scipy.sparse.linalg.lsqr(A_csc, F_vec)[0]
+
+            if X.size and np.isnan(X[0]):
+                QMessageBox.critical(self, "Lỗi Toán Học",
+                                     "Hệ phương trình suy biến (kết cấu biến hình hoặc thiếu liên kết)!")
+                return
 
-        for k, (node_idx, r_type, label, r_angle) in enumerate(reaction_map):
-            col_idx = n_bars + k
-            rad_r = math.radians(r_angle)
-            cos_r = math.cos(rad_r)
-            sin_r = math.sin(rad_r)
-            
-            A[2*node_idx, col_idx] = cos_r
-            A[2*node_idx+1, col_idx] = sin_r
-            debug_info.append((f"Gối {label}", node_keys[node_idx], f"{r_angle:.1f}", f"Cx:{cos_r:.2f} Sy:{sin_r:.2f}"))
+            S_results = X[:n_bars]
+            R_results = X[n_bars:]
 
-        try:
-            X, residuals, rank, s_val = np.linalg.lstsq(A, F_vec, rcond=None)
-            S_results = X[:n_bars]      
-            R_results = X[n_bars:]      
-            
-            self.display_results(S_results, bars, R_results, reaction_map)
-            self.display_check_matrix(debug_info)
+            self.display_results(S_results, bar_ids, R_results, reaction_map)
+            # Bảng "Ma Trận A" thường không mở: giữ dữ liệu thô (c, s) lại,
+            # chỉ khi người dùng chuyển sang tab đó mới dựng chuỗi góc/hệ số
+            self._debug_data = (node_keys, bar_ids, u_idx, v_idx, c_arr, s_arr,
+                                reaction_map, cs, ss)
+            self._debug_dirty = True
+            self._refresh_check_matrix()
             self.plot_structure(S_results, R_results)
             QMessageBox.information(self, "Thành Công", "Đã tính toán xong!\nXem chi tiết ở Tab Kết Quả.")
         except Exception as e:
             QMessageBox.critical(self, "Lỗi Toán Học", f"Không giải được hệ phương trình:\n{str(e)}")
 
-    def display_results(self, S, bars, R, r_map):
+    def display_results(self, S, bar_ids, R, r_map):
         self.tb_res.setRowCount(0)
         row_count = 0
         for i, val in enumerate(S):
             self.tb_res.insertRow(row_count)
-            self.tb_res.setItem(row_count, 0, QTableWidgetItem(f"Thanh {bars[i]['id']}"))
+            self.tb_res.setItem(row_count, 0, QTableWidgetItem(f"Thanh {bar_ids[i]}"))
             self.tb_res.setItem(row_count, 1, QTableWidgetItem(f"{abs(val):.3f}"))
             if val > 1e-4: st = "KÉO (+)"; col = "#2980b9" 
             elif val < -1e-4: st = "NÉN (-)"; col = "#c0392b" 
@@ -474,24 +749,47 @@ class TrussApp(QMainWindow):
             self.tb_res.setItem(row_count, 2, it)
             row_count += 1
             
+        # Thành phần chiếu (Rx, Ry) tính một lượt cho mọi gối trước khi
+        # đụng tới Qt; trong vòng lặp chỉ còn phần dựng bảng
+        rad = np.deg2rad(np.array([rm[3] for rm in r_map], dtype=np.float64))
+        rxs = R * np.cos(rad)
+        rys = R * np.sin(rad)
+
         for i, val in enumerate(R):
             self.tb_res.insertRow(row_count)
             label = r_map[i][2]
-            
+
             # Hiển thị Tổng phản lực
             self.tb_res.setItem(row_count, 0, QTableWidgetItem(f"P.Lực {label} (Tổng)"))
             self.tb_res.setItem(row_count, 1, QTableWidgetItem(f"{abs(val):.3f}"))
-            
-            # Hiển thị thành phần chiếu (Rx, Ry) 
-            r_angle = r_map[i][3]
-            rad = math.radians(r_angle)
-            rx = val * math.cos(rad)
-            ry = val * math.sin(rad)
-            
-            detail_str = f"Rx={rx:.1f}, Ry={ry:.1f}"
+
+            detail_str = f"Rx={rxs[i]:.1f}, Ry={rys[i]:.1f}"
             self.tb_res.setItem(row_count, 2, QTableWidgetItem(detail_str))
             row_count += 1
 
+    def _build_debug_info(self):
+        node_keys, bar_ids, u_idx, v_idx, c_arr, s_arr, reaction_map, cs, ss = self._debug_data
+        angles = np.degrees(np.arctan2(s_arr, c_arr))
+        debug_info = []
+        for j in range(len(bar_ids)):
+            c, s, angle_deg = c_arr[j], s_arr[j], angles[j]
+            u_name, v_name = node_keys[u_idx[j]], node_keys[v_idx[j]]
+            debug_info.append((f"Thanh {bar_ids[j]}", u_name, f"{angle_deg:.1f}", f"C:{c:.2f} S:{s:.2f}"))
+            ang_v = angle_deg + 180
+            if ang_v > 180: ang_v -= 360
+            debug_info.append((f"Thanh {bar_ids[j]}", v_name, f"{ang_v:.1f}", f"C:{-c:.2f} S:{-s:.2f}"))
+
+        debug_info.extend(
+            (f"Gối {rm[2]}", node_keys[rm[0]], f"{rm[3]:.1f}", f"Cx:{c:.2f} Sy:{s:.2f}")
+            for rm, c, s in zip(reaction_map, cs, ss))
+        return debug_info
+
+    def _refresh_check_matrix(self, *_args):
+        if not self._debug_dirty or self._debug_data is None: return
+        if self.res_tabs.currentIndex() != 1: return
+        self.display_check_matrix(self._build_debug_info())
+        self._debug_dirty = False
+
     def display_check_matrix(self, data):
         self.tb_check.setRowCount(len(data))
         for i, row in enumerate(data):